@@ -13,11 +13,16 @@ Features:
 """
 
 import os
+import time
 import asyncio
+import functools
 import logging
+import random
 import sqlite3
+import concurrent.futures
+import threading
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 # Telegram
 from telegram import (
@@ -25,6 +30,8 @@ from telegram import (
     InlineKeyboardButton,
     InlineKeyboardMarkup,
     InputFile,
+    InputMediaDocument,
+    MessageEntity,
     Poll,
 )
 from telegram.constants import ChatAction
@@ -64,10 +71,21 @@ WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "set_a_random_secret")
 PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "")  # e.g. https://your-app.railway.app
 PORT = int(os.getenv("PORT", "8080"))
 
+# One shared client so its HTTP session keeps the TLS connection to Razorpay alive
+RZP_CLIENT = (
+    razorpay.Client(auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET))
+    if RAZORPAY_AVAILABLE and RAZORPAY_KEY_ID and RAZORPAY_KEY_SECRET
+    else None
+)
+
 CLASSES = ["9", "10", "11", "12"]
 CATEGORIES = ["Short Notes", "PYQ", "Sample Papers", "Handwritten Notes", "Test Series", "Quizzes"]
+# lists above keep UI order; use these for membership checks
+CLASSES_SET = frozenset(CLASSES)
+CATEGORIES_SET = frozenset(CATEGORIES)
 
 PAGE_SIZE = 8
+MENU_CACHE_TTL = 60  # seconds; subject/chapter lists only change on admin upload
 DB_PATH = "studybot.db"
 
 # Razorpay plans (amount in paise)
@@ -78,10 +96,13 @@ PLANS = {
 }
 
 # -------------------- DB (SQLite) --------------------
-def db():
-    con = sqlite3.connect(DB_PATH, check_same_thread=False)
-    con.row_factory = sqlite3.Row
-    return con
+# One shared connection for the whole process: keeps SQLite's page cache warm
+# across requests instead of reopening the file on every query.
+CONN = sqlite3.connect(DB_PATH, check_same_thread=False)
+CONN.row_factory = sqlite3.Row
+_db_lock = threading.Lock()
+# Blocking SQLite calls run here so they never stall the bot's event loop.
+DB_POOL = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="db")
 
 SCHEMA = """
 CREATE TABLE IF NOT EXISTS users (
@@ -89,7 +110,7 @@ CREATE TABLE IF NOT EXISTS users (
     tg_id INTEGER UNIQUE,
     name TEXT,
     is_premium INTEGER DEFAULT 0,
-    joined_at TEXT
+    joined_at INTEGER
 );
 
 CREATE TABLE IF NOT EXISTS content (
@@ -101,7 +122,7 @@ CREATE TABLE IF NOT EXISTS content (
     title TEXT,
     file_id TEXT,
     premium INTEGER DEFAULT 0,
-    created_at TEXT
+    created_at INTEGER
 );
 
 CREATE TABLE IF NOT EXISTS quizzes (
@@ -116,7 +137,7 @@ CREATE TABLE IF NOT EXISTS quizzes (
     option4 TEXT,
     correct_index INTEGER,
     premium INTEGER DEFAULT 0,
-    created_at TEXT
+    created_at INTEGER
 );
 
 CREATE TABLE IF NOT EXISTS purchases (
@@ -124,7 +145,7 @@ CREATE TABLE IF NOT EXISTS purchases (
     tg_id INTEGER,
     txn_id TEXT,
     plan TEXT,
-    created_at TEXT
+    created_at INTEGER
 );
 
 CREATE TABLE IF NOT EXISTS quiz_attempts (
@@ -135,94 +156,282 @@ CREATE TABLE IF NOT EXISTS quiz_attempts (
     correct INTEGER,
     timestamp TEXT
 );
+
+-- menu navigation: subjects/chapters/items are always filtered on this prefix
+CREATE INDEX IF NOT EXISTS idx_content_nav ON content(class_num, category, subject, chapter, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_quizzes_nav ON quizzes(class_num, subject, chapter);
+CREATE INDEX IF NOT EXISTS idx_users_premium ON users(is_premium);
 """
 
-with db() as con:
-    con.executescript(SCHEMA)
-    con.commit()
+# WAL lets readers proceed while a write is in flight; synchronous=NORMAL is
+# durable under WAL and skips the fsync on every commit.
+PRAGMAS = """
+PRAGMA journal_mode=WAL;
+PRAGMA synchronous=NORMAL;
+PRAGMA temp_store=MEMORY;
+PRAGMA mmap_size=268435456;
+PRAGMA cache_size=-65536;
+"""
+
+SCHEMA_VERSION = 1
+# table -> timestamp column that moved from ISO-8601 TEXT to epoch-second INTEGER in v1
+EPOCH_COLUMNS = {"users": "joined_at", "content": "created_at", "quizzes": "created_at", "purchases": "created_at"}
+
+def _epoch_migration_sql() -> str:
+    # Databases created before v1 declare the timestamp columns TEXT, and
+    # CREATE TABLE IF NOT EXISTS never changes that, so rebuild those tables
+    # with the current definition and convert the stored values once.
+    steps = []
+    for table, col in EPOCH_COLUMNS.items():
+        info = {row["name"]: row["type"] for row in CONN.execute(f"PRAGMA table_info({table})")}
+        if info.get(col, "").upper() != "TEXT":
+            continue
+        start = SCHEMA.index(f"CREATE TABLE IF NOT EXISTS {table} (")
+        ddl = SCHEMA[start:SCHEMA.index(");", start) + 2]
+        cols = ", ".join(info)
+        select = ", ".join(
+            f"CASE WHEN typeof({c}) = 'text' AND {c} LIKE '____-__-__%' THEN CAST(strftime('%s', {c}) AS INTEGER) ELSE {c} END"
+            if c == col else c
+            for c in info
+        )
+        steps += [
+            ddl.replace(f"IF NOT EXISTS {table} (", f"{table}_v1 ("),
+            f"INSERT INTO {table}_v1 ({cols}) SELECT {select} FROM {table};",
+            # keep AUTOINCREMENT's high-water mark so deleted ids are never reused
+            f"UPDATE sqlite_sequence SET seq = (SELECT seq FROM sqlite_sequence WHERE name = '{table}') "
+            f"WHERE name = '{table}_v1' AND EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = '{table}');",
+            f"DROP TABLE {table};",
+            f"ALTER TABLE {table}_v1 RENAME TO {table};",
+        ]
+    return "\n".join(steps)
+
+with _db_lock, CONN:
+    CONN.executescript(SCHEMA)
+    if CONN.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+        # one transaction: either every table is rebuilt and the version bumped, or nothing changes
+        CONN.executescript(f"BEGIN;\n{_epoch_migration_sql()}\nPRAGMA user_version={SCHEMA_VERSION};\nCOMMIT;")
+        CONN.executescript(SCHEMA)  # dropping the old tables dropped their indexes
+    CONN.executescript(PRAGMAS)
+
+# In-memory caches of the users table so per-update checks skip SQLite.
+# PREMIUM_USERS only caches positive answers: a miss always re-reads the row,
+# so premium granted by any writer (e.g. the Razorpay webhook) is picked up.
+with _db_lock:
+    KNOWN_USERS = {row["tg_id"] for row in CONN.execute("SELECT tg_id FROM users")}
+    PREMIUM_USERS = {row["tg_id"] for row in CONN.execute("SELECT tg_id FROM users WHERE is_premium=1")}
+
+# Fixed SQL text for the hot paths. sqlite3 caches prepared statements per
+# connection keyed on the exact string, so reusing these skips parse + plan.
+Q_INSERT_USER = "INSERT OR IGNORE INTO users (tg_id, name, is_premium, joined_at) VALUES (?,?,0,?)"
+Q_MAKE_PREMIUM = "UPDATE users SET is_premium=1 WHERE tg_id=?"
+Q_IS_PREMIUM = "SELECT is_premium FROM users WHERE tg_id=?"
+Q_INSERT_PURCHASE = "INSERT INTO purchases (tg_id, txn_id, plan, created_at) VALUES (?,?,?,?)"
+Q_INSERT_CONTENT = "INSERT INTO content (class_num, category, subject, chapter, title, file_id, premium, created_at) VALUES (?,?,?,?,?,?,?,?)"
+Q_INSERT_QUIZ = ("INSERT INTO quizzes (class_num, subject, chapter, question, option1, option2, option3, option4, correct_index, premium, created_at) "
+                 "VALUES (?,?,?,?,?,?,?,?,?,?,?)")
+Q_SUBJECTS = "SELECT DISTINCT subject FROM content WHERE class_num=? AND category=? ORDER BY subject"
+Q_CHAPTERS = "SELECT DISTINCT chapter FROM content WHERE class_num=? AND category=? AND subject=? ORDER BY chapter"
+_Q_ITEMS = "SELECT * FROM content WHERE class_num=? AND category=? AND subject=? AND chapter=?"
+Q_ITEMS_FIRST = _Q_ITEMS + " ORDER BY created_at DESC, id DESC LIMIT ?"
+Q_ITEMS_NEXT = _Q_ITEMS + " AND (created_at, id) < (SELECT created_at, id FROM content WHERE id=?) ORDER BY created_at DESC, id DESC LIMIT ?"
+Q_ITEMS_PREV = _Q_ITEMS + " AND (created_at, id) > (SELECT created_at, id FROM content WHERE id=?) ORDER BY created_at ASC, id ASC LIMIT ?"
+Q_ITEMS_BEFORE = ("SELECT COUNT(*) AS c FROM content WHERE class_num=? AND category=? AND subject=? AND chapter=? "
+                  "AND (created_at, id) > (SELECT created_at, id FROM content WHERE id=?)")
+Q_QUIZ_IDS = "SELECT id FROM quizzes WHERE class_num=? AND subject=?"
+Q_QUIZ_IDS_CHAPTER = "SELECT id FROM quizzes WHERE class_num=? AND subject=? AND chapter=?"
+Q_QUIZ_BY_ID = "SELECT * FROM quizzes WHERE id=?"
+Q_STATS = ("SELECT (SELECT COUNT(*) FROM users) AS users, (SELECT COUNT(*) FROM users WHERE is_premium=1) AS prem, "
+           "(SELECT COUNT(*) FROM content) AS docs, (SELECT COUNT(*) FROM quizzes) AS qz")
 
 # -------------------- HELPERS --------------------
 def is_admin(user_id: int) -> bool:
     return user_id in ADMIN_IDS
 
+def ttl_cache(seconds: float, maxsize: int = 256):
+    # memoize on positional args for `seconds`, keeping at most `maxsize` entries;
+    # call .cache_clear() to invalidate
+    def decorator(fn):
+        cache = {}
+        lock = threading.Lock()
+        generation = 0
+
+        @functools.wraps(fn)
+        def wrapper(*args):
+            now = time.monotonic()
+            hit = cache.get(args)
+            if hit and now - hit[0] < seconds:
+                return hit[1]
+            started = generation
+            value = fn(*args)
+            with lock:
+                # a cache_clear() while fn ran means value may predate the write; don't keep it
+                if started == generation:
+                    if args not in cache and len(cache) >= maxsize:
+                        del cache[next(iter(cache))]
+                    cache[args] = (now, value)
+            return value
+
+        def cache_clear():
+            nonlocal generation
+            with lock:
+                generation += 1
+                cache.clear()
+
+        wrapper.cache_clear = cache_clear
+        return wrapper
+    return decorator
+
+async def run_db(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(DB_POOL, fn, *args)
+
+def execute_write_sync(sql: str, params: tuple) -> int:
+    with _db_lock, CONN:
+        return CONN.execute(sql, params).rowcount
+
 async def ensure_user(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
-    if not update.effective_user:
+    if not update.effective_user or update.effective_user.id in KNOWN_USERS:
         return
-    with db() as con:
-        con.execute(
-            "INSERT OR IGNORE INTO users (tg_id, name, is_premium, joined_at) VALUES (?,?,0,?)",
-            (update.effective_user.id, update.effective_user.full_name, datetime.utcnow().isoformat()),
-        )
-        con.commit()
+    await run_db(
+        execute_write_sync,
+        Q_INSERT_USER,
+        (update.effective_user.id, update.effective_user.full_name, int(time.time())),
+    )
+    KNOWN_USERS.add(update.effective_user.id)
 
 def user_is_premium_sync(tg_id: int) -> bool:
-    with db() as con:
-        cur = con.execute("SELECT is_premium FROM users WHERE tg_id=?", (tg_id,))
-        row = cur.fetchone()
-        return bool(row["is_premium"]) if row else False
+    if tg_id in PREMIUM_USERS:
+        return True
+    with _db_lock:
+        row = CONN.execute(Q_IS_PREMIUM, (tg_id,)).fetchone()
+    if row and row["is_premium"]:
+        PREMIUM_USERS.add(tg_id)
+        return True
+    return False
 
 async def user_is_premium(tg_id: int) -> bool:
     # keep async-compatible wrapper
-    return user_is_premium_sync(tg_id)
+    if tg_id in PREMIUM_USERS:
+        return True
+    return await run_db(user_is_premium_sync, tg_id)
 
 # -------------------- MENUS / NAV --------------------
+# Static keyboards never change, so build them once at import.
+CLASS_MENU_MARKUP = InlineKeyboardMarkup(
+    [[InlineKeyboardButton(f"Class {c}", callback_data=f"class|{c}")] for c in CLASSES]
+    + [[InlineKeyboardButton("Buy Premium ⭐", callback_data="buy")]]
+)
+
+def _category_markup(class_num: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(
+        [[InlineKeyboardButton(cat, callback_data=f"cat|{class_num}|{cat}")] for cat in CATEGORIES]
+        + [[InlineKeyboardButton("⬅️ Back", callback_data="home")]]
+    )
+
+CAT_MARKUPS = {c: _category_markup(c) for c in CLASSES}
+
 async def send_menu(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
-    kb = [[InlineKeyboardButton(f"Class {c}", callback_data=f"class|{c}")] for c in CLASSES]
-    kb.append([InlineKeyboardButton("Buy Premium ⭐", callback_data="buy")])
     if update.effective_message:
-        await update.effective_message.reply_text("📚 Choose your class:", reply_markup=InlineKeyboardMarkup(kb))
+        await update.effective_message.reply_text("📚 Choose your class:", reply_markup=CLASS_MENU_MARKUP)
 
 async def send_categories(query, class_num: str):
-    rows = []
-    for cat in CATEGORIES:
-        rows.append([InlineKeyboardButton(cat, callback_data=f"cat|{class_num}|{cat}")])
-    rows.append([InlineKeyboardButton("⬅️ Back", callback_data="home")])
-    await query.edit_message_text(f"Class {class_num} → Choose category:", reply_markup=InlineKeyboardMarkup(rows))
+    markup = CAT_MARKUPS.get(class_num) or _category_markup(class_num)
+    await query.edit_message_text(f"Class {class_num} → Choose category:", reply_markup=markup)
 
+@ttl_cache(MENU_CACHE_TTL)
 def list_subjects_sync(class_num: str, category: str) -> List[str]:
-    with db() as con:
-        cur = con.execute("SELECT DISTINCT subject FROM content WHERE class_num=? AND category=? ORDER BY subject", (class_num, category))
+    with _db_lock:
+        cur = CONN.execute(Q_SUBJECTS, (class_num, category))
         return [r["subject"] for r in cur.fetchall() if r["subject"]]
 
+async def list_subjects(class_num: str, category: str) -> List[str]:
+    return await run_db(list_subjects_sync, class_num, category)
+
 async def send_subjects(query, class_num: str, category: str):
-    subs = list_subjects_sync(class_num, category)
+    subs = await list_subjects(class_num, category)
     if not subs:
         subs = ["Maths", "Physics", "Chemistry", "Biology", "English", "Hindi", "SST"]
-    kb = []
-    for s in subs:
-        kb.append([InlineKeyboardButton(s, callback_data=f"sub|{class_num}|{category}|{s}")])
-    kb.append([InlineKeyboardButton("⬅️ Back", callback_data=f"class|{class_num}")])
+    kb = [[InlineKeyboardButton(s, callback_data=f"sub|{class_num}|{category}|{s}")] for s in subs] + [[InlineKeyboardButton("⬅️ Back", callback_data=f"class|{class_num}")]]
     await query.edit_message_text(f"Class {class_num} → {category} → Choose subject:", reply_markup=InlineKeyboardMarkup(kb))
 
+@ttl_cache(MENU_CACHE_TTL)
 def list_chapters_sync(class_num: str, category: str, subject: str) -> List[str]:
-    with db() as con:
-        cur = con.execute("SELECT DISTINCT chapter FROM content WHERE class_num=? AND category=? AND subject=? ORDER BY chapter", (class_num, category, subject))
+    with _db_lock:
+        cur = CONN.execute(Q_CHAPTERS, (class_num, category, subject))
         return [r["chapter"] for r in cur.fetchall() if r["chapter"]]
 
+async def list_chapters(class_num: str, category: str, subject: str) -> List[str]:
+    return await run_db(list_chapters_sync, class_num, category, subject)
+
 async def send_chapters(query, class_num: str, category: str, subject: str):
-    chs = list_chapters_sync(class_num, category, subject)
+    chs = await list_chapters(class_num, category, subject)
     if not chs:
         chs = ["Chapter 1", "Chapter 2", "Chapter 3"]
-    kb = []
-    for ch in chs:
-        kb.append([InlineKeyboardButton(ch, callback_data=f"chap|{class_num}|{category}|{subject}|{ch}")])
-    kb.append([InlineKeyboardButton("⬅️ Back", callback_data=f"cat|{class_num}|{category}")])
+    kb = [[InlineKeyboardButton(ch, callback_data=f"chap|{class_num}|{category}|{subject}|{ch}")] for ch in chs] + [[InlineKeyboardButton("⬅️ Back", callback_data=f"cat|{class_num}|{category}")]]
     await query.edit_message_text(f"Class {class_num} → {category} → {subject} → Choose chapter:", reply_markup=InlineKeyboardMarkup(kb))
 
-def fetch_items_sync(class_num: str, category: str, subject: str, chapter: str) -> List[sqlite3.Row]:
-    with db() as con:
-        cur = con.execute(
-            "SELECT * FROM content WHERE class_num=? AND category=? AND subject=? AND chapter=? ORDER BY created_at DESC, id DESC",
-            (class_num, category, subject, chapter),
-        )
-        return cur.fetchall()
+_B36 = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+def encode_cursor(direction: str, item_id: int) -> str:
+    # "n"/"p" + base-36 item id; keeps callback_data inside Telegram's 64-byte cap
+    digits = ""
+    while True:
+        item_id, rem = divmod(item_id, 36)
+        digits = _B36[rem] + digits
+        if not item_id:
+            return direction + digits
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[str, int]]:
+    # anything malformed (including pre-keyset page/offset payloads) means "first page"
+    if not cursor or cursor[0] not in "np" or not cursor[1:].isalnum():
+        return None
+    try:
+        return cursor[0], int(cursor[1:], 36)
+    except ValueError:
+        return None
 
-async def send_items(query, tg_id: int, class_num: str, category: str, subject: str, chapter: str, page: int = 0):
-    items = fetch_items_sync(class_num, category, subject, chapter)
+def fetch_items_sync(class_num: str, category: str, subject: str, chapter: str,
+                     cursor: Optional[str] = None, limit: int = PAGE_SIZE) -> Tuple[List[sqlite3.Row], bool]:
+    # Keyset pagination over (created_at, id), newest first.
+    # cursor: None = first page, "n<id>" = items after <id>, "p<id>" = items before <id>.
+    # Returns the page plus whether more items exist beyond it in that direction.
+    parsed = decode_cursor(cursor)
+    backwards = bool(parsed) and parsed[0] == "p"
+    if parsed:
+        sql = Q_ITEMS_PREV if backwards else Q_ITEMS_NEXT
+        params = (class_num, category, subject, chapter, parsed[1], limit + 1)
+    else:
+        sql = Q_ITEMS_FIRST
+        params = (class_num, category, subject, chapter, limit + 1)
+    with _db_lock:
+        rows = CONN.execute(sql, params).fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backwards:
+        rows.reverse()
+    return rows, has_more
+
+def count_items_before_sync(class_num: str, category: str, subject: str, chapter: str, item_id: int) -> int:
+    # 0-based position of an item in the newest-first listing; served from idx_content_nav
+    with _db_lock:
+        return CONN.execute(Q_ITEMS_BEFORE, (class_num, category, subject, chapter, item_id)).fetchone()["c"]
+
+async def fetch_items(class_num: str, category: str, subject: str, chapter: str,
+                      cursor: Optional[str] = None, limit: int = PAGE_SIZE) -> Tuple[List[sqlite3.Row], bool]:
+    return await run_db(fetch_items_sync, class_num, category, subject, chapter, cursor, limit)
+
+async def send_items(query, tg_id: int, class_num: str, category: str, subject: str, chapter: str, cursor: Optional[str] = None):
+    page_items, has_more = await fetch_items(class_num, category, subject, chapter, cursor)
     premium_user = await user_is_premium(tg_id)
 
-    start = page * PAGE_SIZE
-    page_items = items[start:start+PAGE_SIZE]
+    # numbering comes from the data rather than the payload, so callback_data needs no page index
+    parsed = decode_cursor(cursor)
+    cursor = cursor if parsed else None
+    start = 0
+    if page_items and parsed:
+        start = await run_db(count_items_before_sync, class_num, category, subject, chapter, page_items[0]["id"])
+    backwards = bool(parsed) and parsed[0] == "p"
+    has_prev = start > 0
+    has_next = True if backwards else has_more
 
     text_lines = [f"Class {class_num} → {category} → {subject} → {chapter}", ""]
     if not page_items:
@@ -235,50 +444,76 @@ async def send_items(query, tg_id: int, class_num: str, category: str, subject:
 
     buttons = []
     nav = []
-    if start > 0:
-        nav.append(InlineKeyboardButton("⬅️ Prev", callback_data=f"page|{class_num}|{category}|{subject}|{chapter}|{page-1}"))
-    if start + PAGE_SIZE < len(items):
-        nav.append(InlineKeyboardButton("Next ➡️", callback_data=f"page|{class_num}|{category}|{subject}|{chapter}|{page+1}"))
+    if has_prev and page_items:
+        nav.append(InlineKeyboardButton("⬅️ Prev", callback_data=f"page|{class_num}|{category}|{subject}|{chapter}|{encode_cursor('p', page_items[0]['id'])}"))
+    if has_next and page_items:
+        nav.append(InlineKeyboardButton("Next ➡️", callback_data=f"page|{class_num}|{category}|{subject}|{chapter}|{encode_cursor('n', page_items[-1]['id'])}"))
     if nav:
         buttons.append(nav)
     if page_items:
-        buttons.append([InlineKeyboardButton(f"📥 Send #1–#{len(page_items)}", callback_data=f"sendrange|{class_num}|{category}|{subject}|{chapter}|{start}|{len(page_items)}")])
+        buttons.append([InlineKeyboardButton(f"📥 Send #1–#{len(page_items)}", callback_data=f"sendrange|{class_num}|{category}|{subject}|{chapter}|{cursor or ''}")])
     buttons.append([InlineKeyboardButton("⬅️ Back", callback_data=f"chap|{class_num}|{category}|{subject}|{chapter}")])
     if not premium_user:
         buttons.append([InlineKeyboardButton("⭐ Buy Premium", callback_data="buy")])
 
     await query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(buttons))
 
-async def send_documents_by_range(message, tg_id: int, class_num: str, category: str, subject: str, chapter: str, start: int, count: int):
-    items = fetch_items_sync(class_num, category, subject, chapter)
+async def send_documents_by_range(message, tg_id: int, class_num: str, category: str, subject: str, chapter: str, cursor: Optional[str]):
+    # replays the cursor that rendered the page, so exactly that page's items are sent
+    subset, _ = await fetch_items(class_num, category, subject, chapter, cursor or None)
     premium_user = await user_is_premium(tg_id)
-    subset = items[start:start+count]
-    for r in subset:
-        if r["premium"] and not premium_user:
-            await message.reply_text(f"🔒 {r['title']} — Premium only. Use /buy to unlock.")
-            continue
+    allowed = [r for r in subset if premium_user or not r["premium"]]
+    locked = [r for r in subset if r["premium"] and not premium_user]
+    if allowed:
+        # one ordered album (up to 10 documents, PAGE_SIZE fits) instead of a round trip per file
+        docs = [InputMediaDocument(r["file_id"], caption=f"{r['title']}\n(Class {class_num} • {category} • {subject} • {chapter})")
+                for r in allowed]
         try:
             await message.chat.send_action(action=ChatAction.UPLOAD_DOCUMENT)
-            await message.reply_document(r["file_id"], caption=f"{r['title']}\n(Class {class_num} • {category} • {subject} • {chapter})")
+            if len(docs) == 1:
+                await message.reply_document(allowed[0]["file_id"], caption=docs[0].caption)
+            else:
+                await message.reply_media_group(docs)
         except Exception as e:
-            await message.reply_text(f"Failed sending: {r['title']} — {e}")
+            await message.reply_text(f"Failed sending: {', '.join(r['title'] for r in allowed)} — {e}")
+    if locked:
+        await message.reply_text("\n".join(f"🔒 {r['title']} — Premium only." for r in locked) + "\nUse /buy to unlock.")
 
 # -------------------- COMMAND HANDLERS --------------------
-PRICE_TEXT = (
-    "\n".join([
-        "⭐ *Premium Plans*",
+def _build_entities_text(segments: List[tuple]) -> Tuple[str, List[MessageEntity]]:
+    # segments: (text, entity_type or None); offsets are in UTF-16 code units as Telegram expects
+    parts, entities, offset = [], [], 0
+    for text, kind in segments:
+        length = len(text.encode("utf-16-le")) // 2
+        if kind:
+            entities.append(MessageEntity(type=kind, offset=offset, length=length))
+        parts.append(text)
+        offset += length
+    return "".join(parts), entities
+
+# Plain text + precomputed entities: Telegram renders it without parsing Markdown.
+PRICE_TEXT, PRICE_ENTITIES = _build_entities_text([
+    ("⭐ ", None),
+    ("Premium Plans", MessageEntity.BOLD),
+    ("\n".join([
+        "",
         "• 1 Month: ₹99",
         "• 3 Months: ₹249",
         "• 12 Months: ₹699",
         "",
         "Premium me Test Series, Exclusive Handwritten Notes, Full Sample Papers, Fast Support unlock hoga.",
         "",
-        "1) UPI se pay karein: `" + PAYMENT_UPI_ID + "`",
-        "2) Payment note me likhein: `" + PAYMENT_NOTE + "`",
+        "1) UPI se pay karein: ",
+    ]), None),
+    (PAYMENT_UPI_ID, MessageEntity.CODE),
+    ("\n2) Payment note me likhein: ", None),
+    (PAYMENT_NOTE, MessageEntity.CODE),
+    ("\n".join([
+        "",
         "3) Yahan bhejein: /redeem <TXN_ID> (jaise /redeem 12345ABCD)",
         "4) Admin verify karega aur aapko Premium de diya jayega.",
-    ])
-)
+    ]), None),
+])
 
 async def start(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     await ensure_user(update, ctx)
@@ -291,12 +526,12 @@ async def menu_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
 
 async def buy_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     # if Razorpay available we'd show plans (callback via inline buttons)
-    if RAZORPAY_AVAILABLE and RAZORPAY_KEY_ID and RAZORPAY_KEY_SECRET:
+    if RZP_CLIENT is not None:
         kb = [[InlineKeyboardButton(PLANS[k]["label"], callback_data=f"rzp|{k}")] for k in PLANS.keys()]
         kb.append([InlineKeyboardButton("I already paid • Redeem", callback_data="buy")])
         await update.message.reply_text("Choose a Premium plan:", reply_markup=InlineKeyboardMarkup(kb))
     else:
-        await update.message.reply_markdown(PRICE_TEXT)
+        await update.message.reply_text(PRICE_TEXT, entities=PRICE_ENTITIES)
 
 async def redeem_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     await ensure_user(update, ctx)
@@ -305,15 +540,14 @@ async def redeem_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Usage: /redeem <TXN_ID>")
         return
     txn = parts[1].strip()
-    with db() as con:
-        con.execute("INSERT INTO purchases (tg_id, txn_id, plan, created_at) VALUES (?,?,?,?)", (update.effective_user.id, txn, "manual-upi", datetime.utcnow().isoformat()))
-        con.commit()
+    await run_db(execute_write_sync, Q_INSERT_PURCHASE, (update.effective_user.id, txn, "manual-upi", int(time.time())))
     await update.message.reply_text("Thanks! ✅ Aapka TXN ID receive ho gaya. Admin verify karte hi premium mil jayega.")
-    for aid in ADMIN_IDS:
-        try:
-            await ctx.bot.send_message(aid, f"Redeem request from {update.effective_user.full_name} (#{update.effective_user.id})\nTXN: {txn}")
-        except Exception:
-            pass
+    admin_msg = f"Redeem request from {update.effective_user.full_name} (#{update.effective_user.id})\nTXN: {txn}"
+    admins = list(ADMIN_IDS)
+    results = await asyncio.gather(*[ctx.bot.send_message(aid, admin_msg) for aid in admins], return_exceptions=True)
+    for aid, res in zip(admins, results):
+        if isinstance(res, Exception):
+            logging.warning("Could not notify admin %s of redeem: %s", aid, res)
 
 async def make_premium_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     if not update.effective_user or not is_admin(update.effective_user.id):
@@ -323,9 +557,8 @@ async def make_premium_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Usage: /make_premium <tg_id>")
         return
     target_id = int(parts[1])
-    with db() as con:
-        con.execute("UPDATE users SET is_premium=1 WHERE tg_id=?", (target_id,))
-        con.commit()
+    if await run_db(execute_write_sync, Q_MAKE_PREMIUM, (target_id,)):
+        PREMIUM_USERS.add(target_id)
     await update.message.reply_text(f"User {target_id} is now PREMIUM ✅")
     try:
         await ctx.bot.send_message(target_id, "Congrats! ⭐ Aapka premium activate ho gaya.")
@@ -333,21 +566,20 @@ async def make_premium_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
         pass
 
 # -------------------- ADMIN UPLOAD --------------------
+_TRUE_TOKENS = frozenset({"1", "true", "True", "yes", "Y"})
+
 def parse_caption(caption: str) -> Optional[tuple]:
     # format: class|category|subject|chapter|title|premium
-    try:
-        parts = [p.strip() for p in caption.split("|")]
-        if len(parts) != 6:
-            return None
-        class_num, category, subject, chapter, title, premium = parts
-        if class_num not in CLASSES:
-            return None
-        if category not in CATEGORIES:
-            return None
-        prem = 1 if str(premium) in {"1", "true", "True", "yes", "Y"} else 0
-        return class_num, category, subject, chapter, title, prem
-    except Exception:
+    parts = [p.strip() for p in caption.split("|")]
+    if len(parts) != 6:
+        return None
+    class_num, category, subject, chapter, title, premium = parts
+    if class_num not in CLASSES_SET:
         return None
+    if category not in CATEGORIES_SET:
+        return None
+    prem = 1 if premium in _TRUE_TOKENS else 0
+    return class_num, category, subject, chapter, title, prem
 
 async def admin_doc_handler(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     if not update.effective_user or not is_admin(update.effective_user.id):
@@ -360,10 +592,10 @@ async def admin_doc_handler(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
         return
     class_num, category, subject, chapter, title, prem = parsed
     file_id = doc.file_id
-    with db() as con:
-        con.execute("INSERT INTO content (class_num, category, subject, chapter, title, file_id, premium, created_at) VALUES (?,?,?,?,?,?,?,?)",
-                    (class_num, category, subject, chapter, title, file_id, prem, datetime.utcnow().isoformat()))
-        con.commit()
+    await run_db(execute_write_sync, Q_INSERT_CONTENT,
+                 (class_num, category, subject, chapter, title, file_id, prem, int(time.time())))
+    list_subjects_sync.cache_clear()
+    list_chapters_sync.cache_clear()
     await update.message.reply_text(f"Saved ✅\nClass {class_num} • {category} • {subject} • {chapter}\nTitle: {title}\nPremium: {prem}")
 
 # -------------------- QUIZZES --------------------
@@ -382,25 +614,29 @@ async def addquiz_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
         if len(options) != 4:
             raise ValueError("Need 4 options")
         correct_index = int(corr)
-        premium = 1 if prem in {"1", "true", "True", "yes", "Y"} else 0
+        premium = 1 if prem in _TRUE_TOKENS else 0
     except Exception:
         await update.message.reply_text("Format: /addquiz <class> <subject> <chapter> <question> | opt1 ; opt2 ; opt3 ; opt4 | correct_index | premium\nExample:\n/addquiz 10 Maths Chapter-2 \"2+2?\" | 1 ; 2 ; 3 ; 4 | 4 | 0")
         return
-    with db() as con:
-        con.execute("""INSERT INTO quizzes (class_num, subject, chapter, question, option1, option2, option3, option4, correct_index, premium, created_at)
-                       VALUES (?,?,?,?,?,?,?,?,?,?,?)""",
-                    (class_num, subject, chapter, q.strip('"'), options[0], options[1], options[2], options[3], correct_index, premium, datetime.utcnow().isoformat()))
-        con.commit()
+    await run_db(execute_write_sync, Q_INSERT_QUIZ,
+                 (class_num, subject, chapter, q.strip('"'), options[0], options[1], options[2], options[3], correct_index, premium, int(time.time())))
     await update.message.reply_text("Quiz added ✅")
 
-async def send_quiz_for_subject(update: Update, ctx: ContextTypes.DEFAULT_TYPE, class_num: str, subject: str, chapter: Optional[str]):
-    premium_user = await user_is_premium(update.effective_user.id)
-    with db() as con:
+def pick_quiz_sync(class_num: str, subject: str, chapter: Optional[str]) -> Optional[sqlite3.Row]:
+    # pick a random id from the index, then fetch just that row (avoids sorting every match)
+    with _db_lock:
         if chapter:
-            cur = con.execute("SELECT * FROM quizzes WHERE class_num=? AND subject=? AND chapter=? ORDER BY RANDOM() LIMIT 1", (class_num, subject, chapter))
+            cur = CONN.execute(Q_QUIZ_IDS_CHAPTER, (class_num, subject, chapter))
         else:
-            cur = con.execute("SELECT * FROM quizzes WHERE class_num=? AND subject=? ORDER BY RANDOM() LIMIT 1", (class_num, subject))
-        row = cur.fetchone()
+            cur = CONN.execute(Q_QUIZ_IDS, (class_num, subject))
+        ids = cur.fetchall()
+        if not ids:
+            return None
+        return CONN.execute(Q_QUIZ_BY_ID, (random.choice(ids)["id"],)).fetchone()
+
+async def send_quiz_for_subject(update: Update, ctx: ContextTypes.DEFAULT_TYPE, class_num: str, subject: str, chapter: Optional[str]):
+    premium_user = await user_is_premium(update.effective_user.id)
+    row = await run_db(pick_quiz_sync, class_num, subject, chapter)
     if not row:
         await update.message.reply_text("No quiz available yet for this subject/chapter.")
         return
@@ -422,15 +658,15 @@ async def quiz_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     await send_quiz_for_subject(update, ctx, class_num, subject, chapter)
 
 # -------------------- STATS / UTILS --------------------
+def stats_sync() -> sqlite3.Row:
+    with _db_lock:
+        return CONN.execute(Q_STATS).fetchone()
+
 async def stats_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     if not update.effective_user or not is_admin(update.effective_user.id):
         return
-    with db() as con:
-        users = con.execute("SELECT COUNT(*) as c FROM users").fetchone()["c"]
-        prem = con.execute("SELECT COUNT(*) as c FROM users WHERE is_premium=1").fetchone()["c"]
-        docs = con.execute("SELECT COUNT(*) as c FROM content").fetchone()["c"]
-        qz = con.execute("SELECT COUNT(*) as c FROM quizzes").fetchone()["c"]
-    await update.message.reply_text(f"Users: {users}\nPremium: {prem}\nDocs: {docs}\nQuizzes: {qz}")
+    row = await run_db(stats_sync)
+    await update.message.reply_text(f"Users: {row['users']}\nPremium: {row['prem']}\nDocs: {row['docs']}\nQuizzes: {row['qz']}")
 
 async def myid_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(f"Your Telegram ID: {update.effective_user.id}")
@@ -452,11 +688,11 @@ async def help_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
 
 # -------------------- CALLBACKS (buttons) --------------------
 async def buy_cb_router(query, ctx: ContextTypes.DEFAULT_TYPE, key: str):
-    if not (RAZORPAY_AVAILABLE and RAZORPAY_KEY_ID and RAZORPAY_KEY_SECRET):
+    if RZP_CLIENT is None:
         await query.edit_message_text("Online checkout unavailable. Showing UPI instructions…")
-        await ctx.bot.send_message(query.from_user.id, PRICE_TEXT, parse_mode="Markdown")
+        await ctx.bot.send_message(query.from_user.id, PRICE_TEXT, entities=PRICE_ENTITIES)
         return
-    client = razorpay.Client(auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET))
+    client = RZP_CLIENT
     plan = PLANS.get(key)
     if not plan:
         await query.answer("Invalid plan", show_alert=True)